@@ -12,7 +12,18 @@ License: MIT
 
 import sys
 import argparse
+import codecs
 import contextlib
+import mmap
+import os
+import shutil
+
+# encodings that encode ascii characters (including line breaks) as single identical bytes and never use
+# these bytes inside multi byte characters, so a filter expression can be matched on the raw bytes:
+ASCII_COMPATIBLE_ENCODINGS = ('ascii', 'utf-8', 'cp1252')
+
+# buffer size used to read and write the files:
+BUFFER_SIZE = 1 << 20
 
 def parseArgs():
     parser = argparse.ArgumentParser(description = 'Filter a csv file but keep the header as is')
@@ -50,6 +61,76 @@ def smart_open(filename: str = None, mode: str = 'r', *args, **kwargs):
         except AttributeError:
             pass
 
+def isAsciiCompatible(encoding: str) -> bool:
+    name = codecs.lookup(encoding).name
+    return name in ASCII_COMPATIBLE_ENCODINGS or name.startswith('iso8859')
+
+def encodeFilterExpression(filterExpression: str, encoding: str):
+    """
+    Returns the filter expression encoded for filtering on raw bytes, or None if the lines need to be decoded:
+    for encodings that are not ascii compatible or if the expression cannot be encoded (so it never matches).
+    """
+    if not isAsciiCompatible(encoding):
+        return None
+    try:
+        return filterExpression.encode(encoding)
+    except UnicodeEncodeError:
+        return None
+
+def readFirstBlock(filename: str) -> bytes:
+    if filename == '-':
+        # peek does not consume the bytes, so stdin can still be read completely afterwards:
+        return sys.stdin.buffer.peek(BUFFER_SIZE)
+    with open(filename, 'rb') as file_in:
+        return file_in.read(BUFFER_SIZE)
+
+def hasCarriageReturnLineBreaks(block: bytes) -> bool:
+    """
+    Returns True if the block contains a '\r' that is not followed by '\n' (old mac line breaks). The byte
+    based filters only split lines at '\n', so these files need the text path with universal newlines.
+    A '\r' at the very end of the block may be followed by '\n' in the next block, so it is ignored.
+    """
+    return b'\r' in block.replace(b'\r\n', b'').rstrip(b'\r')
+
+def filterLines(file_in, file_out, filterExpression, headerLines: int):
+    skipLines = headerLines
+    while (skipLines > 0):
+        file_out.write(next(file_in))
+        skipLines = skipLines - 1 
+    if len(filterExpression) == 0:
+        # every line matches the empty filter, so copy the rest in large blocks:
+        shutil.copyfileobj(file_in, file_out, BUFFER_SIZE)
+    else:
+        file_out.writelines(line for line in file_in if filterExpression in line)
+
+def filterMappedLines(mm, file_out, filterExpression: bytes, headerLines: int):
+    """
+    Same as filterLines, but for a memory mapped file: instead of looking at every line, the filter expression
+    is searched in the remaining file and only the lines containing a match are extracted.
+    """
+    pos = 0
+    skipLines = headerLines
+    while (skipLines > 0 and pos < len(mm)):
+        lineEnd = mm.find(b'\n', pos)
+        pos = len(mm) if lineEnd < 0 else lineEnd + 1
+        skipLines = skipLines - 1
+    file_out.write(mm[:pos])
+
+    if len(filterExpression) == 0:
+        file_out.write(mm[pos:])
+        return
+
+    while pos < len(mm):
+        found = mm.find(filterExpression, pos)
+        if found < 0:
+            break
+        lineStart = mm.rfind(b'\n', pos, found)
+        lineStart = pos if lineStart < 0 else lineStart + 1
+        lineEnd = mm.find(b'\n', found + len(filterExpression))
+        lineEnd = len(mm) if lineEnd < 0 else lineEnd + 1
+        file_out.write(mm[lineStart:lineEnd])
+        pos = lineEnd
+
 if __name__ == '__main__':
     ARGS = parseArgs()
 
@@ -57,10 +138,23 @@ if __name__ == '__main__':
         ARGS.help
         sys.exit(1)
 
-    with smart_open(ARGS.infile, 'r', encoding=ARGS.encoding) as file_in:
-        with smart_open(ARGS.outfile, 'w', encoding=ARGS.encoding) as file_out:
-            skipLines = int(ARGS.headerLines)
-            while (skipLines > 0):
-                file_out.write(next(file_in))
-                skipLines = skipLines - 1 
-            file_out.writelines(line for line in file_in if ARGS.filterExpression in line)
\ No newline at end of file
+    filterExpression = encodeFilterExpression(ARGS.filterExpression, ARGS.encoding)
+    if filterExpression is not None and hasCarriageReturnLineBreaks(readFirstBlock(ARGS.infile)):
+        # both byte based filters split lines at '\n' only:
+        filterExpression = None
+
+    if filterExpression is not None and ARGS.infile != '-' and os.path.getsize(ARGS.infile) > 0 and b'\n' not in filterExpression:
+        # search the whole (memory mapped) file, so lines without a match are never copied into python objects:
+        with open(ARGS.infile, 'rb') as file_in, mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with smart_open(ARGS.outfile, 'wb', buffering=BUFFER_SIZE) as file_out:
+                filterMappedLines(mm, file_out, filterExpression, int(ARGS.headerLines))
+    elif filterExpression is not None:
+        # filter on the raw bytes, no need to decode and encode every line:
+        with smart_open(ARGS.infile, 'rb', buffering=BUFFER_SIZE) as file_in:
+            with smart_open(ARGS.outfile, 'wb', buffering=BUFFER_SIZE) as file_out:
+                filterLines(file_in, file_out, filterExpression, int(ARGS.headerLines))
+    else:
+        # newline='' keeps the line endings of the input as they are:
+        with smart_open(ARGS.infile, 'r', encoding=ARGS.encoding, newline='', buffering=BUFFER_SIZE) as file_in:
+            with smart_open(ARGS.outfile, 'w', encoding=ARGS.encoding, newline='', buffering=BUFFER_SIZE) as file_out:
+                filterLines(file_in, file_out, ARGS.filterExpression, int(ARGS.headerLines))
\ No newline at end of file
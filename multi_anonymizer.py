@@ -18,9 +18,9 @@ from typing import List, Dict
 import copy
 import argparse
 import csv
+import itertools
 import os.path
 import random
-import shutil
 import sys
 import re
 import numbers
@@ -40,6 +40,7 @@ except ImportError:
 
 try:
     from sqlalchemy import create_engine, select, update, MetaData, Table, bindparam, text
+    from sqlalchemy.engine import make_url
     sql_available = True
 except ImportError:
     sql_available = False
@@ -54,6 +55,26 @@ except ImportError:
 
 FAKER_DICTS = {}
 
+DEFAULT_TEMPLATE = '{{__value__}}'
+
+# extracts values enclosed between "{{" and "}}" (up to an optional filter) from a template:
+TEMPLATE_VARIABLE_PATTERN = re.compile(r'\{\{(.*?)(?:\||\}\})')
+TEMPLATE_VARIABLES = {}
+COMPILED_TEMPLATES = {}
+JSONPATH_EXPRESSIONS = {}
+XPATH_EXPRESSIONS = {}
+
+# database engines and their reflected metadata, shared by all sources using the same connection string:
+DB_ENGINES = {}
+# number of rows sent to the database in one executemany call:
+DB_UPDATE_BATCH_SIZE = 1000
+# print every single replaced database value (set with --verbose):
+VERBOSE = False
+# number of anonymized csv rows handed to the csv writer in one writerows call:
+CSV_WRITE_BATCH_SIZE = 8192
+# buffer size used to read and write csv files:
+CSV_BUFFER_SIZE = 1 << 20
+
 
 def parse_args():
     parser = argparse.ArgumentParser(description='Anonymize columns of one ore more csv/xml/json files or database columns', formatter_class=argparse.RawTextHelpFormatter)
@@ -79,6 +100,10 @@ def parse_args():
                         help='if set, missing files are ignored')
     parser.add_argument('--header-lines', dest='headerLines', default='0',
                         help='set to number of header lines in csv files to ignore, default = 0')
+    parser.add_argument('--db-batch-size', dest='dbBatchSize', default='1000',
+                        help='number of rows updated in one batch in databases, default = 1000')
+    parser.add_argument('-v', '--verbose', dest='verbose', action='store_true',
+                        help='print every replaced value in databases')
     parser.add_argument('--namespace', nargs='+', dest='namespace',
                         help='shortname=http://full-url-of-namespace.com add xml namespaces so they can be used in '
                              'xpath selector, sepearate with equals')
@@ -95,9 +120,13 @@ class Selector:
         self.xpath = None
         self.jsonpath = None
         self.regexp = None
-        self.template = '{{__value__}}'
+        self.regexp_pattern = None
+        self.template = DEFAULT_TEMPLATE
         self.min = 0
         self.max = 1000000
+        self.template_selectors = None
+        self.compiled_template = None
+        self.fake_dict = None
         self.parse_and_set(input_string, legacy_data_type)
     
     def __str__(self):
@@ -142,6 +171,8 @@ class Selector:
             self.xpath = attributes.get('xpath', self.xpath)
             self.jsonpath = attributes.get('jsonpath', self.jsonpath)
             self.regexp = attributes.get('regexp', self.regexp)
+            if self.regexp is not None:
+                self.regexp_pattern = re.compile(self.regexp)
             self.input_type = attributes.get('input-type', self.input_type)
             self.template = attributes.get('template', self.template)
             self.min = int(attributes.get('min', self.min))
@@ -172,22 +203,27 @@ class Source:
 
 
 def get_fake_dict(selector: Selector):
+    """
+    Returns the fake dict shared by all selectors of the same data type. It is kept on the selector,
+    so the global lookup is only done for the first value of a selector.
+    """
     global FAKER_DICTS
 
-    fake_dict = FAKER_DICTS.get(selector.data_type, None)
-    if fake_dict is None:
-        fake_dict = create_faker_dict(selector)
-        FAKER_DICTS[selector.data_type] = fake_dict
-    return fake_dict
+    if selector.fake_dict is None:
+        fake_dict = FAKER_DICTS.get(selector.data_type, None)
+        if fake_dict is None:
+            fake_dict = create_faker_dict(selector)
+            FAKER_DICTS[selector.data_type] = fake_dict
+        selector.fake_dict = fake_dict
+    return selector.fake_dict
 
 
-def search_and_replace_dynamic(input_string: str, pattern: str, replacement: str) -> str:
+def search_and_replace_dynamic(input_string: str, pattern: re.Pattern, replacement: str) -> str:
     """
-    The input string is matched against the given pattern. The group(1) is then replaced.
+    The input string is matched against the given (compiled) pattern. The group(1) is then replaced.
     If the pattern did not match, the input string is returned.
     """
-    p = re.compile(pattern)
-    m = p.match(input_string)
+    m = pattern.match(input_string)
     if m is None:
         print(f"WARN: Regexp does not match inputstring '{input_string}' - no change!")
         return input_string
@@ -196,14 +232,46 @@ def search_and_replace_dynamic(input_string: str, pattern: str, replacement: str
     start_pos = m.start(1)
     return f"{input_string[:m.start(1)]}{replacement}{input_string[m.end(1):]}"
 
+def get_template_variables(template: str) -> tuple:
+    """
+    Returns the (stripped) variable names used in the given template. The result is cached per template string,
+    so the template is only scanned once per run.
+    """
+    variables = TEMPLATE_VARIABLES.get(template, None)
+    if variables is None:
+        variables = tuple(variable.strip() for variable in TEMPLATE_VARIABLE_PATTERN.findall(template))
+        TEMPLATE_VARIABLES[template] = variables
+    return variables
+
+def get_compiled_template(template: str):
+    """
+    Returns the compiled jinja template for the given template string. Environment.from_string does not cache,
+    so the compiled templates are kept here to parse every template only once per run.
+    """
+    jinja_template = COMPILED_TEMPLATES.get(template, None)
+    if jinja_template is None:
+        jinja_template = template_env.from_string(template)
+        COMPILED_TEMPLATES[template] = jinja_template
+    return jinja_template
+
+def get_template_selectors(selector: Selector) -> List[Selector]:
+    """
+    Returns selectors for the anonymization types used as variables in the template of the given selector.
+    Other variables (like '__value__' or 'col_1') are taken from the context. The selectors are created once
+    per selector and reused for every value.
+    """
+    if selector.template_selectors is None:
+        selector.template_selectors = [Selector(f'(type={type})') for type in get_template_variables(selector.template)
+                                       if not type.startswith('__') and not type.endswith('__') and type in FAKER_TYPE_MAP]
+    return selector.template_selectors
+
 def anonymize_value(selector: Selector, original_value, context: Dict[str, str] = {}):
 
     isNumber = isinstance(original_value, numbers.Number)
     value_to_anonymize = original_value
 
     if not isNumber and selector.regexp is not None:
-        pattern = re.compile(selector.regexp)
-        match = pattern.match(value_to_anonymize)
+        match = selector.regexp_pattern.match(value_to_anonymize)
         if match is not None:
             value_to_anonymize = match.group(1)
 
@@ -211,10 +279,8 @@ def anonymize_value(selector: Selector, original_value, context: Dict[str, str]
     anonymized_value = get_fake_dict(selector)[value_to_anonymize] if isNumber or (original_value is not None and len(original_value)) > 0 else ''
 
     if not isNumber and selector.regexp is not None:
-        anonymized_value = search_and_replace_dynamic(original_value, selector.regexp, anonymized_value)
+        anonymized_value = search_and_replace_dynamic(original_value, selector.regexp_pattern, anonymized_value)
 
-    
-    jinja_template = template_env.from_string(selector.template)
     context['__value__'] = anonymized_value
     context['__original_value__'] = original_value
     if selector.column is not None:
@@ -227,22 +293,31 @@ def anonymize_value(selector: Selector, original_value, context: Dict[str, str]
     if selector.jsonpath is not None:
         context[selector.jsonpath] = anonymized_value
 
-    # Extracts values enclosed between "{{" and "}}" as new anonymization types:
-    pattern = re.compile(r'\{\{(.*?)(?:\||\}\})')
-    value_types = pattern.findall(selector.template)
-    for type in value_types:
-        type = type.strip()
-        if not type.startswith('__') and not type.endswith('__'):
-            # add a anonymized string for the type to the context ('{{city}}' will add an anonymized value to for 'city' in context)
-            # print(f'add faker for {type}')
-            tmp_selector = Selector(f'(type={type})')
-            context[type] = get_fake_dict(tmp_selector)[original_value]
+    # the default template would just render the value, so skip jinja:
+    if selector.template == DEFAULT_TEMPLATE:
+        return str(anonymized_value)
+
+    # a template without any jinja markup is a constant value (unless it has line breaks, as jinja normalizes
+    # them to '\n' and removes a trailing one):
+    if ('{{' not in selector.template and '{%' not in selector.template and '{#' not in selector.template
+            and '\n' not in selector.template and '\r' not in selector.template):
+        return selector.template
 
-    return jinja_template.render(context)
+    # add an anonymized value for every anonymization type used in the template ('{{city}}' will add an anonymized value for 'city' to the context)
+    for template_selector in get_template_selectors(selector):
+        context[template_selector.data_type] = get_fake_dict(template_selector)[original_value]
+
+    # keep the compiled template on the selector, so only the first value needs the template cache:
+    if selector.compiled_template is None:
+        selector.compiled_template = get_compiled_template(selector.template)
+    return selector.compiled_template.render(context)
 
 
 def getRandomInt(start: int = 0, end: int = 1000000):
-    return lambda: random.randint(start, end)
+    # randint(start, end) is randrange(start, end + 1) with an extra call layer, so use the bound randrange directly:
+    randrange = random.Random().randrange
+    stop = end + 1
+    return lambda: randrange(start, stop)
 
 
 def anonymize_rows(rows, selectors: List[Selector]):
@@ -250,21 +325,31 @@ def anonymize_rows(rows, selectors: List[Selector]):
     Rows is an iterable of dictionaries that contain fields that need to be anonymized.
     """
 
+    for selector in selectors:
+        if selector.column is None:
+            print(f'No column given in selector {selector}')
+            sys.exit(3)
+
+    # if no template needs the row context, selectors without regexp just look up the value in their fake dict:
+    lookup_only = all(selector.template == DEFAULT_TEMPLATE for selector in selectors)
+    # resolve column index, fake dict lookup and lookup mode of every selector once, not once per row:
+    prepared_selectors = [(selector, int(selector.column), get_fake_dict(selector).__getitem__, lookup_only and selector.regexp is None)
+                          for selector in selectors]
+
     # Iterate over the rows and yield anonymized rows.
     for row in rows:
         context = {}
-        for selector in selectors:
-
-            if selector.column is None:
-                print(f'No column given in selector {selector}')
-                sys.exit(3)
-
-            column_index = int(selector.column)
+        row_length = len(row)
+        for selector, column_index, get_fake_value, plain_lookup in prepared_selectors:
             # Replace the column with faked fields if filled (trim whitespace first):
-            if column_index < len(row):
-                if len(row[column_index].strip()) > 0:
-                    original_value = row[column_index].strip().replace('\n', '')
-                    anonymized_value = anonymize_value(selector, original_value, context)
+            if column_index < row_length:
+                value = row[column_index].strip()
+                if value:
+                    original_value = value.replace('\r', '').replace('\n', '')
+                    if plain_lookup:
+                        anonymized_value = str(get_fake_value(original_value))
+                    else:
+                        anonymized_value = anonymize_value(selector, original_value, context)
                     row[column_index] = anonymized_value
         # Yield the row back to the caller
         yield row
@@ -277,8 +362,8 @@ def anonymize_csv(source_file_name, target_file_name, selectors: List[Selector],
     """
 
     counter = 0
-    with open(source_file_name, 'r', encoding=encoding, newline=None) as inputfile:
-        with open(target_file_name, 'w', encoding=encoding) as outputfile:
+    with open(source_file_name, 'r', encoding=encoding, newline='', buffering=CSV_BUFFER_SIZE) as inputfile:
+        with open(target_file_name, 'w', encoding=encoding, buffering=CSV_BUFFER_SIZE) as outputfile:
             # Use the DictReader to easily extract fields
             reader = csv.reader(inputfile, delimiter=delimiter)
             writer = csv.writer(outputfile, delimiter=delimiter, lineterminator='\n')
@@ -288,12 +373,33 @@ def anonymize_csv(source_file_name, target_file_name, selectors: List[Selector],
             while skip_lines > 0:
                 writer.writerow(next(reader))
                 skip_lines = skip_lines - 1
-            for row in anonymize_rows(reader, selectors):
-                writer.writerow(row)
-                counter += 1
+            rows = anonymize_rows(reader, selectors)
+            while True:
+                batch = list(itertools.islice(rows, CSV_WRITE_BATCH_SIZE))
+                if not batch:
+                    break
+                writer.writerows(batch)
+                counter += len(batch)
     return counter
 
 
+def get_xpath_expression(xpath: str, namespaces: Dict[str, str]):
+    """
+    Returns the compiled xpath expression for the element part of the given xpath and the name of the
+    attribute to anonymize (or None). The expressions are compiled only once and reused for all files.
+    """
+    key = (xpath, tuple(sorted(namespaces.items())))
+    xpath_and_attribute = XPATH_EXPRESSIONS.get(key, None)
+    if xpath_and_attribute is None:
+        selector_parts = xpath.split('/@')
+        element_selector = selector_parts[0]
+        attribute_name = None
+        if len(selector_parts) > 1:
+            attribute_name = selector_parts[1]  # /person/address/@id -> id
+        xpath_and_attribute = [etree.XPath(element_selector, namespaces=namespaces), attribute_name]
+        XPATH_EXPRESSIONS[key] = xpath_and_attribute
+    return xpath_and_attribute
+
 def anonymize_xml(source_file_name, target_file_name, selectors: List[Selector], encoding, namespaces) -> int:
     """
     The source argument is a path to an XML file containing data to anonymize,
@@ -316,13 +422,9 @@ def anonymize_xml(source_file_name, target_file_name, selectors: List[Selector],
             print(f'No xpath given in selector {selector}')
             sys.exit(3)
 
-        selector_parts = selector.xpath.split('/@')
-        element_selector = selector_parts[0]
-        attribute_name = None
-        if len(selector_parts) > 1:
-            attribute_name = selector_parts[1]  # /person/address/@id -> id
+        [xpath_expression, attribute_name] = get_xpath_expression(selector.xpath, namespaces)
 
-        for element in tree.xpath(element_selector, namespaces=namespaces):
+        for element in xpath_expression(tree):
             if attribute_name is None:
                 element.text = str(anonymize_value(selector, element.text, context))
             else:
@@ -331,9 +433,8 @@ def anonymize_xml(source_file_name, target_file_name, selectors: List[Selector],
                 element.attrib[attribute_name] = anonymized_value
             counter += 1
 
-    result = etree.tostring(tree, pretty_print=True, encoding=encoding).decode(encoding)
-    with open(target_file_name, 'w', encoding=encoding) as outputfile:
-        outputfile.write(result)
+    # lxml serializes and encodes directly into the file, no need to decode and encode the document again:
+    tree.write(target_file_name, pretty_print=True, encoding=encoding)
     return counter
 
 def anonymize_json(source_file_name, target_file_name, selectors: List[Selector], encoding) -> int:
@@ -357,6 +458,17 @@ def anonymize_json(source_file_name, target_file_name, selectors: List[Selector]
 
     return counter
 
+def get_jsonpath_expression(path: str):
+    """
+    Returns the parsed jsonpath expression for the given path. Parsing is expensive (pure python parser),
+    so every path is parsed only once per run, even if it is applied to many files or database values.
+    """
+    jsonpath_expression = JSONPATH_EXPRESSIONS.get(path, None)
+    if jsonpath_expression is None:
+        jsonpath_expression = parse(path)
+        JSONPATH_EXPRESSIONS[path] = jsonpath_expression
+    return jsonpath_expression
+
 def anonymize_json_obj(data: Dict, selectors: List[Selector], context: Dict[str, str] = {}) -> [str, int]:
     counter = 0
     for selector in selectors:
@@ -365,19 +477,55 @@ def anonymize_json_obj(data: Dict, selectors: List[Selector], context: Dict[str,
             print(f'No jsonpath given in selector {selector}')
             sys.exit(3)
 
-        jsonpath_expression = parse(selector.jsonpath)
-
-        matches = [match.value for match in jsonpath_expression.find(data)]
+        jsonpath_expression = get_jsonpath_expression(selector.jsonpath)
 
         for match in jsonpath_expression.find(data):
             original_value = match.value
             if original_value is not None:
                 anonymized_value = str(anonymize_value(selector, original_value, context)) 
-                match.full_path.update(data, anonymized_value)
+                update_json_match(data, match, anonymized_value)
                 counter += 1
     return [data, counter]
 
 
+def update_json_match(data, match, value):
+    """
+    Sets the value of the given jsonpath match. Simple field and index matches are set directly in their
+    parent object, everything else is updated by walking the full path from the root.
+    """
+    parent = match.context.value if match.context is not None else None
+    if isinstance(match.path, jsonpath.Fields) and len(match.path.fields) == 1 and isinstance(parent, dict):
+        parent[match.path.fields[0]] = value
+    elif isinstance(match.path, jsonpath.Index) and isinstance(getattr(match.path, 'index', None), int) and isinstance(parent, list):
+        parent[match.path.index] = value
+    else:
+        match.full_path.update(data, value)
+
+
+def get_db_engine_options(connection_string) -> Dict:
+    """
+    Returns driver specific engine options, so the batched updates are sent to the database in bulk
+    instead of one statement per row (which is what executemany does by default for these drivers).
+    """
+    url = make_url(connection_string)
+    if url.get_backend_name() == 'postgresql' and url.get_driver_name() == 'psycopg2':
+        return {'executemany_mode': 'values_plus_batch'}
+    if url.get_backend_name() == 'mssql' and url.get_driver_name() == 'pyodbc':
+        return {'fast_executemany': True}
+    return {}
+
+def get_db_engine(connection_string):
+    """
+    Returns the engine and metadata for the given connection string. Both are created once, so multiple
+    tables of the same database share the connection pool and tables are only reflected once.
+    """
+    engine_and_metadata = DB_ENGINES.get(connection_string, None)
+    if engine_and_metadata is None:
+        engine_and_metadata = (create_engine(connection_string, echo = False, **get_db_engine_options(connection_string)), MetaData())
+        DB_ENGINES[connection_string] = engine_and_metadata
+    return engine_and_metadata
+
+
 def anonymize_db(connection_string, selectors: List[Selector], encoding) -> int:
 
     if not sql_available:
@@ -389,7 +537,7 @@ def anonymize_db(connection_string, selectors: List[Selector], encoding) -> int:
             print(f'No table given in selector {selector}')
             sys.exit(3)
 
-    engine = create_engine(connection_string, echo = False)
+    engine, metadata = get_db_engine(connection_string)
 
     counter = 0
 
@@ -397,7 +545,6 @@ def anonymize_db(connection_string, selectors: List[Selector], encoding) -> int:
     with engine.connect() as connection:
 
         # all selectors operate on the same table
-        metadata = MetaData()
         table = Table(selectors[0].table, metadata, autoload_with = engine, schema=selectors[0].schema)
 
         for selector in selectors:
@@ -408,11 +555,13 @@ def anonymize_db(connection_string, selectors: List[Selector], encoding) -> int:
                 print(f"add where clause '{selector.where}'")
                 select_stmt = select_stmt.where(text(selector.where))
 
-            # Select all distinct values in the column
-            distinct_values = connection.execute(select_stmt).scalars().all()
+            # Select all distinct values in the column (streamed with a server side cursor where the driver supports it)
+            select_stmt = select_stmt.execution_options(stream_results=True, yield_per=1000)
+            distinct_values = connection.execute(select_stmt).scalars()
 
             # Generate anonymized values
             anonymized_map = {}
+            last_progress_time = time.perf_counter()
             for original_value in distinct_values:
                 context = {}
                 if original_value is not None and selector.jsonpath is not None:
@@ -427,20 +576,41 @@ def anonymize_db(connection_string, selectors: List[Selector], encoding) -> int:
 
                 anonymized_map[original_value] = anonymized_value
 
-            # Update table with anonymized values
+                # print progress at most once per second instead of once per value:
+                now = time.perf_counter()
+                if now - last_progress_time > 1.0:
+                    print(f'  anonymized {len(anonymized_map)} values of {selector.column}', flush=True)
+                    last_progress_time = now
+
+            # Update table with anonymized values (one prepared statement executed for all values)
+            update_stmt = (
+                    update(table)
+                    .where(table.c[selector.column] == bindparam('orig_value'))
+                    .values({selector.column: bindparam('new_value')})
+                )
+            if selector.where:
+                print(f"add where clause to update'{selector.where}'")
+                update_stmt = update_stmt.where(text(selector.where))
+
+            update_params = []
+            replaced_counter = 0
             for original_value, anonymized_value in anonymized_map.items():
-                update_stmt = (
-                        update(table)
-                        .where(table.c[selector.column] == bindparam('orig_value'))
-                        .values({selector.column: bindparam('new_value')})
-                    )
-                if selector.where:
-                    print(f"add where clause to update'{selectors[0].where}'")
-                    update_stmt = update_stmt.where(text(selector.where))
-
-                connection.execute(update_stmt, [{"orig_value": original_value, "new_value": anonymized_value}])    
-                print(f'replacing {selector.column}: {original_value} with {anonymized_value}')
+                if anonymized_value == original_value:
+                    continue # nothing changed, no need to update
+                if original_value is None:
+                    continue # 'where column = NULL' never matches a row
+                if VERBOSE:
+                    print(f'replacing {selector.column}: {original_value} with {anonymized_value}')
+                update_params.append({"orig_value": original_value, "new_value": anonymized_value})
+                replaced_counter += 1
                 counter += 1
+                if len(update_params) >= DB_UPDATE_BATCH_SIZE:
+                    connection.execute(update_stmt, update_params)
+                    update_params = []
+
+            if len(update_params) > 0:
+                connection.execute(update_stmt, update_params)
+            print(f'  replaced {replaced_counter} distinct values of {selector.column}')
 
             connection.commit()
     
@@ -502,51 +672,49 @@ def anonymize_db(connection_string, selectors: List[Selector], encoding) -> int:
 def dummy_value():
     return 'dummy'
 
-def get_faker_type_map(selector: Selector) -> Dict:
-    return {
-        'name': FAKER.name,
-        'first_name': FAKER.first_name,
-        'last_name': FAKER.last_name,
-        'number': getRandomInt(selector.min, selector.max),
-        'email': FAKER.email,
-        'phone_number': FAKER.phone_number,
-        'zip': FAKER.postcode,
-        'postcode': FAKER.postcode,
-        'city': FAKER.city,
-        'street': FAKER.street_address,
-        'street_name': FAKER.street_name,
-        'iban': FAKER.iban,
-        'sentence': FAKER.sentence,
-        'word': FAKER.word,
-        'text': FAKER.text,
-        'date': FAKER.date,
-        'uuid4': FAKER.uuid4,
-        'company': FAKER.company,
-        'dummy': dummy_value,
-    }
+# map of data type -> function returning the fake value generator for a selector.
+# The generators are only looked up on the (global) FAKER when a fake dict is created for a data type.
+FAKER_TYPE_MAP = {
+    'name': lambda selector: FAKER.name,
+    'first_name': lambda selector: FAKER.first_name,
+    'last_name': lambda selector: FAKER.last_name,
+    'number': lambda selector: getRandomInt(selector.min, selector.max),
+    'email': lambda selector: FAKER.email,
+    'phone_number': lambda selector: FAKER.phone_number,
+    'zip': lambda selector: FAKER.postcode,
+    'postcode': lambda selector: FAKER.postcode,
+    'city': lambda selector: FAKER.city,
+    'street': lambda selector: FAKER.street_address,
+    'street_name': lambda selector: FAKER.street_name,
+    'iban': lambda selector: FAKER.iban,
+    'sentence': lambda selector: FAKER.sentence,
+    'word': lambda selector: FAKER.word,
+    'text': lambda selector: FAKER.text,
+    'date': lambda selector: FAKER.date,
+    'uuid4': lambda selector: FAKER.uuid4,
+    'company': lambda selector: FAKER.company,
+    'dummy': lambda selector: dummy_value,
+}
 
 def create_faker_dict(selector: Selector) -> {}:
-    FAKER_TYPE_MAP = get_faker_type_map(selector)
-
-    # Create mappings of names & emails to faked names & emails.
-    fake_dict = None
-    data_type = selector.data_type
-
-    if data_type in FAKER_TYPE_MAP.keys():
-        fake_dict = defaultdict(FAKER_TYPE_MAP[data_type])
-    return fake_dict
+    # Create mappings of original values to faked values.
+    generator_factory = FAKER_TYPE_MAP.get(selector.data_type, None)
+    if generator_factory is None:
+        print(f'Invalid faker data type "{selector.data_type}" used in selector "{selector}"')
+        sys.exit(4)
+    return defaultdict(generator_factory(selector))
 
 def find_rightmost_colon(input_string):
-    # Use a negative lookbehind assertion to exclude '::'
-    pattern = r'(?<!:):(?!:)'
-    
-    matches = re.finditer(pattern, input_string)
-    positions = [match.start() for match in matches]
-    
-    if positions:
-        return max(positions)
-    else:
-        return None
+    # search backwards for a colon that is not part of '::' (the character after a found colon is never a colon):
+    index = input_string.rfind(':')
+    while index >= 0:
+        if index == 0 or input_string[index - 1] != ':':
+            return index
+        # skip the whole run of colons:
+        while index > 0 and input_string[index - 1] == ':':
+            index = index - 1
+        index = input_string.rfind(':', 0, index)
+    return None
 
 def print_selector_map(map):
     for key in map.keys():
@@ -556,22 +724,21 @@ def print_selector_map(map):
             print(f'  selector: {sel}')
 
 
+# unidecode for the poor: translation table for the characters replaced by the unidecode filter
+UNIDECODE_TABLE = str.maketrans({
+        'ä': 'ae',
+        'ö': 'oe',
+        'ü': 'ue',
+        'Ä': 'Ae',
+        'Ö': 'Oe',
+        'Ü': 'Ue',
+        'ß': 'ss'
+    })
+
 # Define the custom filter
 def unidecode_filter(text):
 #    return unidecode(string)
-    # unidecode for the poor:
-    replacements = {
-            'ä': 'ae',
-            'ö': 'oe',
-            'ü': 'ue',
-            'Ä': 'Ae',
-            'Ö': 'Oe',
-            'Ü': 'Ue',
-            'ß': 'ss'
-        }
-    for char, replacement in replacements.items():
-        text = text.replace(char, replacement)
-    return text
+    return text.translate(UNIDECODE_TABLE)
 
 
 if __name__ == '__main__':
@@ -589,6 +756,9 @@ if __name__ == '__main__':
 
     FAKER = Factory.create(ARGS.locale)
 
+    DB_UPDATE_BATCH_SIZE = int(ARGS.dbBatchSize)
+    VERBOSE = ARGS.verbose
+
     # special handling for tab delimiter to allow easier passing as command line:
     if ARGS.delimiter == "\t":
         print('Detected tab as delimiter')
@@ -651,10 +821,9 @@ if __name__ == '__main__':
             source_selector_map[source].append(selector)
 
             # fail fast for invalid data types:
-            faker_type_map = get_faker_type_map(selector)
-            if selector.data_type not in faker_type_map.keys():
+            if selector.data_type not in FAKER_TYPE_MAP.keys():
                 print(f'Invalid faker data type "{selector.data_type}" used in selector "{selector}"')            
-                valid_faker_types = ', '.join([f"'{str(i)}'" for i in faker_type_map.keys()])
+                valid_faker_types = ', '.join([f"'{str(i)}'" for i in FAKER_TYPE_MAP.keys()])
                 print(f'Valid faker types are: {valid_faker_types}')
                 sys.exit(4)
 
@@ -700,7 +869,8 @@ if __name__ == '__main__':
                 # move anonymized file to original file
                 if ARGS.overwrite:
                     print('overwriting original file %s with anonymized file!' % source.name)
-                    shutil.move(src=target, dst=source.name)
+                    # the target is written next to the source, so this is a rename on the same filesystem:
+                    os.replace(target, source.name)
 
             else:
                 if ARGS.ignoreMissingFile: